@@ -5,162 +5,573 @@ Achieves 80-90% compression by recompressing images and optimizing structure
 """
 
 import sys
+import os
+import argparse
+import struct
+import multiprocessing
+from multiprocessing import resource_tracker, shared_memory
 import fitz  # PyMuPDF
 import io
-import base64
+import hashlib
+import functools
+import numpy as np
+from PIL import Image
 import json
 
-def compress_pdf(input_data, level):
-    """Compress PDF using PyMuPDF with intelligent compression strategy"""
+try:
+    import orjson
+except ImportError:  # orjson is optional, fall back to the stdlib encoder
+    orjson = None
+
+# Upper bound on rendering worker processes
+MAX_WORKERS = 4
+
+# Progressive compression settings: lowest level -> (image quality, scale factor, dpi)
+COMPRESSION_LEVELS = {
+    1: (60, 0.9, 240),
+    2: (50, 0.85, 216),
+    3: (40, 0.8, 192),
+    5: (30, 0.7, 168),
+    6: (25, 0.6, 144),
+    7: (20, 0.5, 120),
+    8: (15, 0.4, 96),
+    9: (10, 0.3, 72),
+    10: (5, 0.2, 72),
+}
+
+# Highest level linearized by default, where output is likely to be viewed
+# over the network; above it the smallest file size matters more
+LINEARIZE_MAX_LEVEL = 5
+
+# Pages rendered per worker task
+BATCH_SIZE = 8
+
+# Largest per-pixel channel spread on a page thumbnail that still counts as grayscale
+GRAY_TOLERANCE = 8
+
+# Scale of the thumbnail used for color detection
+THUMBNAIL_MATRIX = fitz.Matrix(0.1, 0.1)
+
+# Grayscale pages with fewer mid-tone pixels than this are stored as 1-bit images
+MONO_MIDTONE_RATIO = 0.01
+
+# Producers whose output is already optimized
+OPTIMIZER_PRODUCERS = ('ghostscript', 'qpdf', 'pikepdf', 'pdftk', 'pdf-xchange optimized')
+
+# Optimizer output below this many bytes per page is returned unchanged
+OPTIMIZED_BYTES_PER_PAGE = 50_000
+
+# Embedded images smaller than this are left untouched
+MIN_IMAGE_BYTES = 16 * 1024
+
+# Document opened once per worker process by _init_worker
+_worker_doc = None
+
+# JPEG output buffer reused across batches rendered by the same process
+_worker_buf = io.BytesIO()
+
+# Semaphore bounding how many shared memory blobs workers may have outstanding
+_worker_shm_slots = None
+
+@functools.lru_cache(maxsize=16)
+def _level_params(level):
+    """Look up (image quality, scale factor, dpi) for the highest table level not above level"""
+    key = max((k for k in COMPRESSION_LEVELS if k <= level), default=min(COMPRESSION_LEVELS))
+    return COMPRESSION_LEVELS[key]
+
+def _save_jpeg(im, fp, image_quality, optimize):
+    """Encode a Pillow image as progressive 4:2:0 JPEG"""
+    im.save(fp, "JPEG", quality=image_quality, optimize=optimize, progressive=True, subsampling=2)
+
+def _is_grayscale(page):
+    """Check a low-resolution thumbnail for any visible color"""
+    thumb = page.get_pixmap(matrix=THUMBNAIL_MATRIX, alpha=False)
+    samples = np.frombuffer(thumb.samples_mv, dtype=np.uint8).reshape(-1, 3).astype(np.int16)
+    return (samples.max(axis=1) - samples.min(axis=1)).max() <= GRAY_TOLERANCE
+
+def _is_bilevel(pix):
+    """Check whether a grayscale pixmap is almost entirely black and white"""
+    samples = np.frombuffer(pix.samples_mv, dtype=np.uint8)
+    midtones = np.count_nonzero((samples > 32) & (samples < 224))
+    return midtones < MONO_MIDTONE_RATIO * samples.size
+
+def _downscale(im, mode, scale_factor):
+    """Shrink an image by scale_factor, converting it to mode
+    
+    JPEGs are decoded at a reduced DCT scale where possible, and whole-number
+    factors are taken with a box filter before the final LANCZOS resample.
+    """
+    new_size = (max(1, int(im.width * scale_factor)), max(1, int(im.height * scale_factor)))
+    
+    # No-op for anything other than JPEG
+    im.draft(mode, new_size)
+    im = im.convert(mode)
+    
+    factor = min(im.width // new_size[0], im.height // new_size[1])
+    if factor >= 2:
+        im = im.reduce(factor)
+    if im.size != new_size:
+        im = im.resize(new_size, Image.LANCZOS)
+    return im
+
+def _init_worker(input_data, shm_slots=None):
+    """Open the source PDF once in each worker process"""
+    global _worker_doc, _worker_shm_slots
+    _worker_doc = fitz.open(stream=input_data, filetype="pdf")
+    _worker_shm_slots = shm_slots
+
+def _render_batch(args):
+    """Render a run of consecutive pages to images, one after another in _worker_buf
+    
+    Returns entries of (page_num, offset, length, width, height, pixel size, colorspace)
+    into the buffer. The colorspace is None for G4 TIFF pages.
+    """
+    start, stop, dpi, image_quality, scale_factor, optimize = args
+    mat = fitz.Matrix(dpi/72, dpi/72)  # Scale based on DPI
+    
+    _worker_buf.seek(0)
+    _worker_buf.truncate()
+    entries = []
+    
+    for page_num, page in enumerate(_worker_doc.pages(start, stop), start):
+        # Get page dimensions
+        rect = page.rect
+        new_width = rect.width * scale_factor
+        new_height = rect.height * scale_factor
+        
+        # Render page at lower DPI for smaller file size, in grayscale when it has no color
+        offset = _worker_buf.tell()
+        if _is_grayscale(page):
+            pix = page.get_pixmap(matrix=mat, colorspace=fitz.csGRAY, alpha=False)
+            im = Image.frombuffer("L", (pix.width, pix.height), pix.samples_mv, "raw", "L", pix.stride, 1)
+            
+            # Black and white pages compress far better as CCITT G4 than as JPEG
+            if _is_bilevel(pix):
+                # The TIFF writer seeks within its file, so encode it separately before appending
+                tiff = io.BytesIO()
+                im.convert("1", dither=Image.Dither.NONE).save(tiff, "TIFF", compression="group4")
+                _worker_buf.write(tiff.getbuffer())
+                colorspace = None
+            else:
+                _save_jpeg(im, _worker_buf, image_quality, optimize)
+                colorspace = "/DeviceGray"
+        else:
+            pix = page.get_pixmap(matrix=mat, alpha=False)
+            im = Image.frombuffer("RGB", (pix.width, pix.height), pix.samples_mv, "raw", "RGB", pix.stride, 1)
+            _save_jpeg(im, _worker_buf, image_quality, optimize)
+            colorspace = "/DeviceRGB"
+        
+        entries.append((page_num, offset, _worker_buf.tell() - offset, new_width, new_height,
+                        (pix.width, pix.height), colorspace))
+        
+        # PyMuPDF always renders into a fresh pixmap, so release this page's pixmap
+        # (and the image viewing its samples) before the next page is rendered
+        del im, pix
+    
+    return entries
+
+def _render_batch_shared(args):
+    """Render a batch in a worker process and hand its blob back through shared memory
+    
+    Returns (entries, shared memory name, blob size). The main process unlinks the
+    segment and releases its slot once it has copied the pages out.
+    """
+    entries = _render_batch(args)
+    size = _worker_buf.tell()
+    
+    _worker_shm_slots.acquire()
+    shm = shared_memory.SharedMemory(create=True, size=max(1, size))
+    with _worker_buf.getbuffer() as view:
+        shm.buf[:size] = view[:size]
+    shm.close()
+    
+    return entries, shm.name, size
+
+def _render_pages(input_data, page_count, dpi, image_quality, scale_factor, optimize):
+    """Render all pages, in parallel when there is more than one page
+    
+    Returns parallel lists (widths, heights, images, image sizes, colorspaces)
+    indexed by page number.
+    """
+    # PyMuPDF holds the GIL for the whole render, so pages are spread over processes;
+    # threads would only help with a binding that renders outside the GIL
+    num_workers = min(os.cpu_count() or 1, MAX_WORKERS, page_count)
+    
+    # Hand out batches of consecutive pages, small enough to keep every worker busy
+    batch_size = min(BATCH_SIZE, -(-page_count // num_workers))
+    args = [(start, min(start + batch_size, page_count), dpi, image_quality, scale_factor, optimize)
+            for start in range(0, page_count, batch_size)]
+    
+    widths = [0.0] * page_count
+    heights = [0.0] * page_count
+    images = [None] * page_count
+    image_sizes = [None] * page_count
+    colorspaces = [None] * page_count
+    
+    def collect(batches):
+        # Batches arrive in any order, each entry lands in its page's slot
+        for entries, blob in batches:
+            for page_num, offset, length, new_width, new_height, image_size, colorspace in entries:
+                widths[page_num] = new_width
+                heights[page_num] = new_height
+                images[page_num] = bytes(blob[offset:offset + length])
+                image_sizes[page_num] = image_size
+                colorspaces[page_num] = colorspace
+    
+    def attach(results, shm_slots):
+        # Copy each batch out of shared memory, then free the segment for the next one.
+        # After a failed batch the remaining ones are still drained and unlinked.
+        error = None
+        while True:
+            try:
+                entries, name, size = next(results)
+            except StopIteration:
+                break
+            except Exception as e:
+                error = error or e
+                continue
+            
+            shm = shared_memory.SharedMemory(name=name)
+            try:
+                if error is None:
+                    with shm.buf[:size] as blob:
+                        yield entries, blob
+            finally:
+                shm.close()
+                shm.unlink()
+                shm_slots.release()
+        
+        if error is not None:
+            raise error
+    
+    if num_workers <= 1:
+        _init_worker(input_data)
+        collect((_render_batch(a), _worker_buf.getvalue()) for a in args)
+    else:
+        # Rendered batches come back through shared memory rather than pickled bytes
+        shm_slots = multiprocessing.Semaphore(2 * num_workers)
+        
+        # Start the resource tracker before forking so workers share it; segments a
+        # failed run never consumed are then unlinked when this process exits
+        resource_tracker.ensure_running()
+        with multiprocessing.Pool(num_workers, initializer=_init_worker, initargs=(input_data, shm_slots)) as pool:
+            collect(attach(pool.imap_unordered(_render_batch_shared, args), shm_slots))
+    
+    return widths, heights, images, image_sizes, colorspaces
+
+def _add_jpeg_xobject(doc, page, jpeg_data, image_size, colorspace):
+    """Write a JPEG as a DCTDecode image XObject drawn across the whole page"""
+    xref = doc.get_new_xref()
+    doc.update_object(xref, f"<</Type/XObject/Subtype/Image/Width {image_size[0]}/Height {image_size[1]}"
+                            f"/ColorSpace{colorspace}/BitsPerComponent 8>>")
+    
+    # update_stream resets the filter, so it is declared afterwards
+    doc.update_stream(xref, jpeg_data, compress=False)
+    doc.xref_set_key(xref, "Filter", "/DCTDecode")
+    
+    contents = doc.get_new_xref()
+    doc.update_object(contents, "<<>>")
+    doc.update_stream(contents, f"q {page.rect.width:.4f} 0 0 {page.rect.height:.4f} 0 0 cm /Im0 Do Q".encode())
+    
+    doc.xref_set_key(page.xref, "Resources", f"<</XObject<</Im0 {xref} 0 R>>>>")
+    doc.xref_set_key(page.xref, "Contents", f"{contents} 0 R")
+
+def _rasterize_document(input_data, page_count, dpi, image_quality, scale_factor, optimize, linearize):
+    """Build a new PDF with every page rendered to a single image"""
+    # Create new document for compressed output
+    new_doc = fitz.open()
+    
+    # Rasterize pages in worker processes, then assemble on the main process
+    widths, heights, images, image_sizes, colorspaces = _render_pages(
+        input_data, page_count, dpi, image_quality, scale_factor, optimize)
+    
+    # One target rect, resized per page
+    dst = fitz.Rect(0, 0, 0, 0)
+    
+    for new_width, new_height, img_data, image_size, colorspace in zip(widths, heights, images, image_sizes, colorspaces):
+        # Create new page with scaled dimensions
+        new_page = new_doc.new_page(width=new_width, height=new_height)
+        
+        # JPEGs are embedded as-is, without MuPDF parsing them again
+        if colorspace is not None:
+            _add_jpeg_xobject(new_doc, new_page, img_data, image_size, colorspace)
+            continue
+        
+        # Insert compressed image into new page
+        dst.x1 = new_width
+        dst.y1 = new_height
+        new_page.insert_image(dst, stream=img_data)
+    
+    # Save with maximum compression
+    output_buffer = io.BytesIO()
+    new_doc.save(output_buffer, 
+                garbage=4, 
+                deflate=True, 
+                clean=True,
+                deflate_images=True,
+                deflate_fonts=True,
+                linear=linearize)
+    new_doc.close()
+    
+    return output_buffer.getvalue()
+
+def _replace_image_stream(doc, xref, jpeg_data, width, height, gray):
+    """Point an image XObject at new JPEG data and fix up its dictionary"""
+    doc.update_stream(xref, jpeg_data, compress=False)
+    doc.xref_set_key(xref, "Filter", "/DCTDecode")
+    if doc.xref_get_key(xref, "DecodeParms")[0] != 'null':
+        doc.xref_set_key(xref, "DecodeParms", "null")
+    doc.xref_set_key(xref, "Width", str(width))
+    doc.xref_set_key(xref, "Height", str(height))
+    doc.xref_set_key(xref, "ColorSpace", "/DeviceGray" if gray else "/DeviceRGB")
+    doc.xref_set_key(xref, "BitsPerComponent", "8")
+
+def _redirect_image(doc, pno, img, target_xref):
+    """Point the XObject resource entry behind a page image at another xref"""
+    name, referencer = img[7], img[9]
+    container = referencer or doc.page_xref(pno)
+    path = []
+    
+    # Follow Resources and XObject through indirect objects, since keys are set per object
+    for key in ("Resources", "XObject"):
+        kind, value = doc.xref_get_key(container, "/".join(path + [key]))
+        if kind == 'xref':
+            container = int(value.split()[0])
+            path = []
+        elif kind == 'dict':
+            path.append(key)
+        else:
+            # Inherited or missing resources
+            return False
+    
+    doc.xref_set_key(container, "/".join(path + [name]), f"{target_xref} 0 R")
+    return True
+
+def _recompress_images(doc, image_quality, scale_factor, optimize):
+    """Recompress large embedded images in place, returning how many were rewritten"""
+    seen_xrefs = set()
+    duplicates = {}  # xref -> earlier xref holding identical image data
+    first_xrefs = {}  # image digest -> first xref seen with that data
+    rewritten = 0
+    
+    for pno in range(len(doc)):
+        for img in doc.get_page_images(pno, full=True):
+            xref, smask, colorspace = img[0], img[1], img[5]
+            
+            # Every reference to a duplicate is repointed at the single kept copy
+            if xref in duplicates:
+                _redirect_image(doc, pno, img, duplicates[xref])
+                continue
+            
+            # Shared images only need to be rewritten once
+            if xref in seen_xrefs:
+                continue
+            seen_xrefs.add(xref)
+            
+            # Leave masked (soft, stencil or color-key), indexed, CMYK and custom-decoded images alone
+            if smask or colorspace not in ('DeviceRGB', 'DeviceGray', 'ICCBased'):
+                continue
+            if doc.xref_get_key(xref, "Mask")[0] != 'null' or doc.xref_get_key(xref, "Decode")[0] != 'null':
+                continue
+            
+            info = doc.extract_image(xref)
+            if not info or info['ext'] not in ('jpeg', 'jpg', 'png') or info['colorspace'] not in (1, 3):
+                continue
+            
+            # Identical images stored under separate xrefs are encoded once
+            digest = hashlib.blake2b(info['image'], digest_size=16).digest()
+            if digest in first_xrefs:
+                duplicates[xref] = first_xrefs[digest]
+                if not _redirect_image(doc, pno, img, first_xrefs[digest]):
+                    # Unreachable resources keep their own xref with a copy of the encoded data
+                    doc.xref_copy(first_xrefs[digest], xref)
+                rewritten += 1
+                continue
+            first_xrefs[digest] = xref
+            
+            if len(info['image']) < MIN_IMAGE_BYTES:
+                continue
+            
+            gray = info['colorspace'] == 1
+            mode = 'L' if gray else 'RGB'
+            
+            # An image Pillow cannot decode or encode keeps its original data
+            try:
+                im = Image.open(io.BytesIO(info['image']))
+                if scale_factor < 1:
+                    im = _downscale(im, mode, scale_factor)
+                else:
+                    im = im.convert(mode)
+                
+                buf = io.BytesIO()
+                _save_jpeg(im, buf, image_quality, optimize)
+            except (OSError, ValueError, Image.DecompressionBombError) as e:
+                print(f"Skipping image xref {xref}: {e}", file=sys.stderr)
+                continue
+            
+            # Only keep the new stream if it is actually smaller
+            if buf.tell() >= len(doc.xref_stream_raw(xref)):
+                continue
+            
+            _replace_image_stream(doc, xref, buf.getvalue(), im.width, im.height, gray)
+            rewritten += 1
+    
+    return rewritten
+
+def compress_pdf(input_data, level, linearize=None):
+    """Compress PDF using PyMuPDF with intelligent compression strategy
+    
+    linearize controls web-optimized output; by default only levels up to
+    LINEARIZE_MAX_LEVEL are linearized.
+    """
+    if linearize is None:
+        linearize = level <= LINEARIZE_MAX_LEVEL
+    
     try:
         # Open PDF from bytes
         doc = fitz.open(stream=input_data, filetype="pdf")
         original_size = len(input_data)
         
+        # Output of another optimizer that is already small per page has nothing left to gain
+        producer = (doc.metadata or {}).get('producer', '').lower()
+        bytes_per_page = original_size / max(1, len(doc))
+        if bytes_per_page < OPTIMIZED_BYTES_PER_PAGE and any(name in producer for name in OPTIMIZER_PRODUCERS):
+            print(f"Skipping already optimized PDF (producer {producer!r}, {bytes_per_page:.0f} bytes/page)", file=sys.stderr)
+            doc.close()
+            return input_data
+        
         # For level 1, use basic optimization without image conversion
+        optimized_data = None
         if level == 1:
-            # Try basic PDF optimization first
-            output_buffer = io.BytesIO()
-            doc.save(output_buffer, 
-                    garbage=4, 
-                    deflate=True, 
-                    clean=True,
-                    deflate_images=True,
-                    deflate_fonts=True,
-                    linear=False)
-            optimized_data = output_buffer.getvalue()
-            
-            # If optimization actually reduced size, return it
-            if len(optimized_data) < original_size:
-                doc.close()
-                return optimized_data
+            # Try basic PDF optimization first; the linearization hint tables can cost
+            # more than a small file saves, so retry without them before giving up
+            for linear in ((True, False) if linearize else (False,)):
+                output_buffer = io.BytesIO()
+                doc.save(output_buffer, 
+                        garbage=4, 
+                        deflate=True, 
+                        clean=True,
+                        deflate_images=True,
+                        deflate_fonts=True,
+                        linear=linear)
+                optimized_data = output_buffer.getvalue()
+                
+                # If optimization actually reduced size, return it
+                if len(optimized_data) < original_size:
+                    doc.close()
+                    return optimized_data
             
             # If optimization didn't help, use very light image compression
-            print(f"Basic optimization failed ({original_size} -> {len(optimized_data)}), using light image compression")
+            print(f"Basic optimization failed ({original_size} -> {len(optimized_data)}), using light image compression", file=sys.stderr)
         
         # For higher levels or when basic optimization fails, use image compression
-        # Progressive compression settings based on level
-        if level >= 10:
-            image_quality = 5
-            scale_factor = 0.2
-            dpi = 72
-        elif level >= 9:
-            image_quality = 10
-            scale_factor = 0.3
-            dpi = 72
-        elif level >= 8:
-            image_quality = 15
-            scale_factor = 0.4
-            dpi = 96
-        elif level >= 7:
-            image_quality = 20
-            scale_factor = 0.5
-            dpi = 120
-        elif level >= 6:
-            image_quality = 25
-            scale_factor = 0.6
-            dpi = 144
-        elif level >= 5:
-            image_quality = 30
-            scale_factor = 0.7
-            dpi = 168
-        elif level >= 3:
-            image_quality = 40
-            scale_factor = 0.8
-            dpi = 192
-        elif level >= 2:
-            image_quality = 50
-            scale_factor = 0.85
-            dpi = 216
-        else:  # level 1 fallback
-            image_quality = 60
-            scale_factor = 0.9
-            dpi = 240
-        
-        # Create new document for compressed output
-        new_doc = fitz.open()
-        
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-            
-            # Get page dimensions
-            rect = page.rect
-            new_width = rect.width * scale_factor
-            new_height = rect.height * scale_factor
-            
-            # Create new page with scaled dimensions
-            new_page = new_doc.new_page(width=new_width, height=new_height)
-            
-            # Render page at lower DPI for smaller file size
-            mat = fitz.Matrix(dpi/72, dpi/72)  # Scale based on DPI
-            pix = page.get_pixmap(matrix=mat)
-            
-            # Convert to JPEG with compression
-            img_data = pix.tobytes("jpeg", jpg_quality=image_quality)
-            
-            # Insert compressed image into new page
-            new_page.insert_image(fitz.Rect(0, 0, new_width, new_height), stream=img_data)
+        image_quality, scale_factor, dpi = _level_params(level)
         
-        # Save with maximum compression
-        output_buffer = io.BytesIO()
-        new_doc.save(output_buffer, 
+        # Optimized Huffman tables cost more CPU than they save at the smallest qualities
+        optimize = level < 9
+        
+        # Recompress embedded images in place, keeping text and vector content intact
+        if _recompress_images(doc, image_quality, scale_factor, optimize):
+            output_buffer = io.BytesIO()
+            doc.save(output_buffer, 
                     garbage=4, 
                     deflate=True, 
                     clean=True,
                     deflate_images=True,
                     deflate_fonts=True,
-                    linear=False)
-        compressed_data = output_buffer.getvalue()
+                    linear=linearize)
+            compressed_data = output_buffer.getvalue()
+        else:
+            # No large images to recompress, fall back to rasterizing every page
+            compressed_data = _rasterize_document(input_data, len(doc), dpi, image_quality, scale_factor, optimize, linearize)
         
         # Check if compression actually reduced size
         if len(compressed_data) >= original_size:
-            print(f"Image compression failed ({original_size} -> {len(compressed_data)}), returning optimized version")
-            # Return the basic optimized version instead
+            print(f"Image compression failed ({original_size} -> {len(compressed_data)}), returning optimized version", file=sys.stderr)
+            # Return the basic optimized version instead, unless linearizing made it larger
             doc.close()
-            new_doc.close()
-            return optimized_data if 'optimized_data' in locals() else input_data
+            if optimized_data is not None and len(optimized_data) <= original_size:
+                return optimized_data
+            return input_data
         
         # Clean up
         doc.close()
-        new_doc.close()
         
         return compressed_data
         
     except Exception as e:
         raise Exception(f"PDF compression failed: {str(e)}")
 
+def read_stdin_frame():
+    """Read a length-prefixed PDF frame (4-byte little-endian size, then the bytes) from stdin"""
+    header = sys.stdin.buffer.read(4)
+    if len(header) < 4:
+        raise Exception("No input provided")
+    
+    size = struct.unpack('<I', header)[0]
+    input_data = sys.stdin.buffer.read(size)
+    if len(input_data) != size:
+        raise Exception(f"Truncated input: expected {size} bytes, got {len(input_data)}")
+    return input_data
+
+def write_result(result):
+    """Write the JSON result envelope to stdout"""
+    if orjson is not None:
+        sys.stdout.buffer.write(orjson.dumps(result) + b"\n")
+        sys.stdout.buffer.flush()
+    else:
+        print(json.dumps(result), flush=True)
+
 def main():
-    """Main function to handle command line input"""
+    """Main function to handle command line input
+    
+    With --output, the compressed PDF is written to that path and a JSON result
+    envelope is printed. Without it, the raw compressed bytes go to stdout.
+    """
+    parser = argparse.ArgumentParser(description="Compress a PDF using PyMuPDF")
+    parser.add_argument('--input', help="PDF to compress (default: length-prefixed frame on stdin)")
+    parser.add_argument('--output', help="Where to write the compressed PDF (default: raw bytes on stdout)")
+    parser.add_argument('--level', type=int, required=True, help="Compression level from 1 to 10")
+    parser.add_argument('--linearize', action=argparse.BooleanOptionalAction, default=None,
+                        help=f"Web-optimize the output (default: only for levels up to {LINEARIZE_MAX_LEVEL})")
+    args = parser.parse_args()
+    
     try:
-        # Read all input from stdin
-        input_text = sys.stdin.read().strip()
-        if not input_text:
-            raise Exception("No input provided")
-            
-        input_json = json.loads(input_text)
-        input_data = base64.b64decode(input_json['data'])
-        level = int(input_json['level'])
+        if args.input:
+            with open(args.input, 'rb') as f:
+                input_data = f.read()
+        else:
+            input_data = read_stdin_frame()
         
         # Compress PDF
-        compressed_data = compress_pdf(input_data, level)
+        compressed_data = compress_pdf(input_data, args.level, args.linearize)
+        
+        if not args.output:
+            sys.stdout.buffer.write(compressed_data)
+            sys.stdout.buffer.flush()
+            return
+        
+        with open(args.output, 'wb') as f:
+            f.write(compressed_data)
         
-        # Return base64 encoded result
         result = {
             'success': True,
-            'data': base64.b64encode(compressed_data).decode('utf-8'),
             'original_size': len(input_data),
             'compressed_size': len(compressed_data),
             'compression_ratio': ((len(input_data) - len(compressed_data)) / len(input_data)) * 100
         }
-        
-        print(json.dumps(result))
+        write_result(result)
         
     except Exception as e:
+        if not args.output:
+            print(str(e), file=sys.stderr)
+            sys.exit(1)
+        
         error_result = {
             'success': False,
             'error': str(e)
         }
-        print(json.dumps(error_result))
+        write_result(error_result)
         sys.exit(1)
 
 if __name__ == "__main__":
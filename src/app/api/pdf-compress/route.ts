@@ -1,43 +1,62 @@
 import { NextRequest } from 'next/server'
 import { PythonShell } from 'python-shell'
 import path from 'path'
+import os from 'os'
+import { randomUUID } from 'crypto'
+import { readFile, writeFile, unlink } from 'fs/promises'
 
 export const runtime = 'nodejs'
 export const dynamic = 'force-dynamic'
 
 export async function POST(req: NextRequest) {
+  // Temp files used to hand the PDF to the Python script without base64/JSON framing
+  const id = randomUUID()
+  const inputPath = path.join(os.tmpdir(), `pdf-compress-${id}-in.pdf`)
+  const outputPath = path.join(os.tmpdir(), `pdf-compress-${id}-out.pdf`)
+
   try {
     const form = await req.formData()
     const file = form.get('file') as File | null
     const levelStr = (form.get('level') as string) || '7'
     const level = Number(levelStr)
+    // Optional override of the script's per-level linearization default
+    const linearize = form.get('linearize') as string | null
 
     if (!file) {
       return new Response('No file provided', { status: 400 })
     }
 
-    const arrayBuffer = await file.arrayBuffer()
-    const base64Data = Buffer.from(arrayBuffer).toString('base64')
-
-    // Prepare input for Python script
-    const inputData = {
-      data: base64Data,
-      level: level
+    let linearizeArgs: string[] = []
+    if (linearize !== null) {
+      const value = linearize.trim().toLowerCase()
+      if (['true', 'on', '1', 'yes'].includes(value)) {
+        linearizeArgs = ['--linearize']
+      } else if (['false', 'off', '0', 'no'].includes(value)) {
+        linearizeArgs = ['--no-linearize']
+      } else {
+        return new Response(`Invalid linearize value: ${linearize}`, { status: 400 })
+      }
     }
 
+    const arrayBuffer = await file.arrayBuffer()
+    await writeFile(inputPath, Buffer.from(arrayBuffer))
+
     // Run Python compression script
     const result = await new Promise<any>((resolve, reject) => {
       const options = {
         mode: 'text' as const,
         pythonPath: path.join(process.cwd(), 'scripts', 'venv', 'bin', 'python3'),
         scriptPath: path.join(process.cwd(), 'scripts'),
-        args: []
+        args: [
+          '--input', inputPath,
+          '--output', outputPath,
+          '--level', String(level),
+          ...linearizeArgs,
+        ]
       }
 
       const pyshell = new PythonShell('compress_pdf.py', options)
       
-      pyshell.send(JSON.stringify(inputData))
-      
       pyshell.on('message', (message) => {
         try {
           const result = JSON.parse(message.trim())
@@ -62,8 +81,7 @@ export async function POST(req: NextRequest) {
       return new Response(JSON.stringify({ error: result.error }), { status: 500 })
     }
 
-    // Convert base64 result back to buffer
-    const compressedBuffer = Buffer.from(result.data, 'base64')
+    const compressedBuffer = await readFile(outputPath)
 
     return new Response(compressedBuffer, {
       headers: {
@@ -73,6 +91,8 @@ export async function POST(req: NextRequest) {
     })
   } catch (err: any) {
     return new Response(JSON.stringify({ error: err?.message || 'Compression failed' }), { status: 500 })
+  } finally {
+    await Promise.all([unlink(inputPath), unlink(outputPath)].map((p) => p.catch(() => {})))
   }
 }
 